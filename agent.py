@@ -1,22 +1,42 @@
 import os
 import sys
 import argparse
+import contextlib
+import importlib.util
+import io
 import subprocess
-import pandas as pd
+import textwrap
+import traceback
+import warnings
 import re
+import hashlib
 from pathlib import Path
-from google import genai
-from google.genai.errors import APIError
+from typing import Optional
 
 # --- Configuration & Paths ---
 MAX_ATTEMPTS = 3
 MODEL_NAME = "gemini-2.5-flash" 
+PROMPT_TEXT_LIMIT = 3000 # Max characters of PDF text sent to the LLM
 PARSER_DIR = Path("custom_parsers")
 TEST_SCRIPT = Path("tests/test_parser_template.py")
 DATA_DIR = Path("data/icici")
 PDF_PATH = DATA_DIR / "icici_sample.pdf"
 CSV_PATH = DATA_DIR / "icici_expected.csv"
 PARSER_PATH = PARSER_DIR / "icici_parser.py"
+LLM_CACHE_DIR = Path(".cache/llm") # Used only when LLM_CACHE=1
+CONTEXT_CACHE_TTL = "600s" # Lifetime of the server-side cache for the static prompt prefix
+
+# Gemini context cache names, keyed by a hash of the static prompt prefix (one per agent run)
+_CONTEXT_CACHES = {}
+
+# Gemini client shared by all attempts, created on first use by _client()
+_CLIENT = None
+
+# Test script module, imported on first use by run_test_and_capture_output
+_TEST_MODULE = None
+
+# Strips non-ASCII runs from the PDF text before it goes into the prompt
+_ASCII = re.compile(r'[^\x00-\x7F]+')
 
 # The schema the agent must enforce (used in prompt generation)
 CSV_SCHEMA_PROMPT = (
@@ -30,40 +50,116 @@ CSV_SCHEMA_PROMPT = (
 
 def read_pdf_text_for_prompt(pdf_path: Path) -> str:
     """
-    Reads the raw text from the PDF file using PyPDF2 (pypdf) to provide context to the LLM.
+    Reads the raw text from the PDF file using pdfplumber to provide context to the LLM.
     This simulates the initial text extraction step an agent would perform.
+    Stops reading pages once enough text has been collected for the prompt.
     """
     try:
-        from PyPDF2 import PdfReader
+        import pdfplumber
     except ImportError:
-        raise ImportError("PyPDF2 (pypdf) not installed. Cannot read PDF for context.")
+        raise ImportError("pdfplumber not installed. Cannot read PDF for context.")
         
-    text = ""
+    buf = []
+    total = 0
     try:
-        with open(pdf_path, "rb") as f:
-            reader = PdfReader(f)
-            for page in reader.pages:
+        with pdfplumber.open(pdf_path) as pdf:
+            for page in pdf.pages:
                 page_text = page.extract_text()
                 if page_text:
-                    text += page_text + "\n"
+                    buf.append(page_text + "\n")
+                    total += len(page_text) + 1
+                    if total >= PROMPT_TEXT_LIMIT:
+                        break
     except Exception as e:
         raise RuntimeError(f"Error reading PDF file {pdf_path}: {e}")
         
     # Simple sanitization before feeding to LLM
-    cleaned = re.sub(r'[^\x00-\x7F]+', ' ', text)
-    return cleaned.strip()[:3000] # Truncate to limit token cost for the prompt
+    cleaned = _ASCII.sub(' ', "".join(buf))
+    return cleaned.strip()[:PROMPT_TEXT_LIMIT] # Truncate to limit token cost for the prompt
 
 
-def get_llm_response(prompt: str) -> str:
-    """Calls the Gemini API to get the generated code."""
-    try:
+def _client():
+    """Returns the shared Gemini client, creating it on first use."""
+    global _CLIENT
+    if _CLIENT is None:
+        from google import genai
         # Use os.getenv for API key access
-        client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
-        response = client.models.generate_content(
-            model=MODEL_NAME, 
-            contents=prompt,
-            config={"temperature": 0.1} # Low temp for stable code
-        )
+        _CLIENT = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+    return _CLIENT
+
+def _context_cache_key(static_prefix: str) -> str:
+    """Key of the static prompt prefix in _CONTEXT_CACHES."""
+    return hashlib.sha256(f"{MODEL_NAME}\n{static_prefix}".encode("utf-8")).hexdigest()
+
+def _get_context_cache(client, static_prefix: str):
+    """
+    Returns the name of a Gemini context cache holding the static prompt prefix, creating it
+    on first use. Returns None if the API refuses to cache it (e.g. prefix below the minimum
+    cacheable size), in which case the full prompt is sent on every call.
+    """
+    from google.genai.errors import APIError
+
+    key = _context_cache_key(static_prefix)
+    if key not in _CONTEXT_CACHES:
+        try:
+            cache = client.caches.create(
+                model=MODEL_NAME,
+                config={"contents": [static_prefix], "ttl": CONTEXT_CACHE_TTL}
+            )
+            _CONTEXT_CACHES[key] = cache.name
+        except APIError:
+            _CONTEXT_CACHES[key] = None
+    return _CONTEXT_CACHES[key]
+
+def get_llm_response(static_prefix: str, dynamic_suffix: str, use_context_cache: bool = False) -> str:
+    """
+    Calls the Gemini API to get the generated code.
+    With use_context_cache (refinement attempts, which resend the same prefix), the static prefix
+    (instructions, schema, PDF text) is served from a server-side context cache where possible,
+    so only the per-attempt suffix is sent. If the cache has expired or is rejected, the entry
+    is dropped and the full prompt is sent instead.
+    When LLM_CACHE=1, responses are stored on disk keyed by a hash of the model and prompt,
+    so repeated runs with unchanged inputs skip the API call.
+    """
+    prompt = static_prefix + dynamic_suffix
+    cache_path = None
+    if os.getenv("LLM_CACHE") == "1":
+        digest = hashlib.sha256(f"{MODEL_NAME}\n{prompt}".encode("utf-8")).hexdigest()
+        cache_path = LLM_CACHE_DIR / f"{digest}.txt"
+        if cache_path.exists():
+            return cache_path.read_text(encoding="utf-8")
+
+    # Imported only when the API is actually called; guarded separately because the
+    # `except APIError` clause below needs the name to exist
+    try:
+        from google.genai.errors import APIError
+    except ImportError as e:
+        return f"LLM_API_ERROR: Client failure: {e}"
+
+    try:
+        client = _client()
+        config = {"temperature": 0.1} # Low temp for stable code
+        response = None
+        cache_name = _get_context_cache(client, static_prefix) if use_context_cache else None
+        if cache_name:
+            try:
+                response = client.models.generate_content(
+                    model=MODEL_NAME, 
+                    contents=dynamic_suffix,
+                    config={**config, "cached_content": cache_name}
+                )
+            except APIError:
+                # Cache expired (TTL) or was rejected: forget it and send the full prompt
+                _CONTEXT_CACHES.pop(_context_cache_key(static_prefix), None)
+        if response is None:
+            response = client.models.generate_content(
+                model=MODEL_NAME, 
+                contents=prompt,
+                config=config
+            )
+        if cache_path is not None and response.text:
+            LLM_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            cache_path.write_text(response.text, encoding="utf-8")
         return response.text
     except APIError as e:
         return f"LLM_API_ERROR: {e}"
@@ -72,10 +168,17 @@ def get_llm_response(prompt: str) -> str:
 
 def extract_python_code(response: str) -> str:
     """Extracts the first markdown Python code block (```python ... ```)."""
-    match = re.search(r"```python\n(.*?)```", response, re.DOTALL)
-    if match:
-        return match.group(1).strip()
-    return response.strip()
+    fence = "```python\n"
+    start = response.find(fence)
+    if start == -1:
+        return response.strip()
+    start += len(fence)
+    end = response.find("```", start)
+    # An unterminated block (e.g. truncated response) keeps everything after the opening fence.
+    # Only surrounding blank lines are trimmed, so a uniformly indented block stays detectable
+    # (and fixable) by apply_local_fix.
+    block = response[start:end] if end != -1 else response[start:]
+    return block.rstrip().lstrip("\n")
 
 def save_parser(code: str, path: Path):
     """Saves the generated code to the parser file, ensuring essential imports are present."""
@@ -88,42 +191,112 @@ def save_parser(code: str, path: Path):
         "import re"
     ]
     
+    # Drop the LLM's own copies of these imports so the file has a single import header
+    code = "".join(line for line in code.splitlines(keepends=True) if line.rstrip() not in required_imports).lstrip("\n")
+    
     # Combine imports and generated code
     final_code = "\n".join(required_imports) + "\n\n" + code
     
     with open(path, "w", encoding="utf-8") as f:
         f.write(final_code)
 
-def run_test_and_capture_output(target: str) -> tuple[str, str]:
-    """Runs the test script and captures the result and full output (T4)."""
-    # Runs: python tests/test_parser_template.py <target>
+def _load_test_module():
+    """Imports the test script once and reuses it across attempts."""
+    global _TEST_MODULE
+    if _TEST_MODULE is None:
+        spec = importlib.util.spec_from_file_location("test_parser_template", str(TEST_SCRIPT))
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        _TEST_MODULE = module
+    return _TEST_MODULE
+
+def _run_test_subprocess(target: str) -> tuple[int, str]:
+    """Runs: python tests/test_parser_template.py <target> in a fresh interpreter."""
     cmd = [sys.executable, str(TEST_SCRIPT), target]
-    
-    # Run the external test script (Tool Call)
     result = subprocess.run(
         cmd,
         capture_output=True,
         text=True
     )
+    return result.returncode, result.stdout + result.stderr
+
+def _run_test_in_process(target: str) -> tuple[int, str]:
+    """Runs the test script's run_test(<target>) in this process, capturing its output."""
+    # Drop the previous attempt's parser so the freshly written code is loaded
+    sys.modules.pop(f"custom_parsers.{target}_parser", None)
+
+    buf = io.StringIO()
+    exit_code = 0
+    # Warning filters changed by the generated code are restored after the run
+    with warnings.catch_warnings(), contextlib.redirect_stdout(buf), contextlib.redirect_stderr(buf):
+        try:
+            _load_test_module().run_test(target)
+        except SystemExit as e:
+            # Same mapping as a process exit status: None -> 0, int -> itself, anything else -> 1
+            exit_code = 0 if e.code is None else (e.code if isinstance(e.code, int) else 1)
+        except Exception:
+            traceback.print_exc(file=buf)
+            exit_code = 1
+    return exit_code, buf.getvalue()
+
+def run_test_and_capture_output(target: str) -> tuple[str, str]:
+    """
+    Runs the test script and captures the result and full output (T4).
+    By default the test runs in-process (equivalent to: python tests/test_parser_template.py <target>)
+    to avoid paying interpreter and pandas start-up on every attempt. The generated parser is then
+    not isolated from the agent: pandas options or monkeypatches it sets persist into later attempts,
+    and a hang, os._exit() or native crash stops the agent. Set TEST_SUBPROCESS=1 to run each test
+    in a separate interpreter instead.
+    """
+    # Run the test script (Tool Call)
+    if os.getenv("TEST_SUBPROCESS") == "1":
+        exit_code, output = _run_test_subprocess(target)
+    else:
+        exit_code, output = _run_test_in_process(target)
     
-    output = result.stdout + result.stderr
-    
-    # Test is successful if the return code is 0 AND the success marker is found
-    if result.returncode == 0 and "SUCCESS" in output:
+    # Test is successful if the exit code is 0 AND the success marker is found
+    if exit_code == 0 and "SUCCESS" in output:
         return "PASS", output
     else:
         return "FAIL", output
 
-def generate_prompt(target: str, pdf_text: str, csv_path: str, is_initial: bool, previous_code: str, error_trace: str) -> str:
-    """Generates the planning/refinement prompt for the LLM."""
-    
-    # Read CSV to get the exact column names for the target schema
+def apply_local_fix(output: str, code: str) -> Optional[str]:
+    """
+    Fast-path recovery for test failures that can be fixed without an LLM round-trip.
+    Returns the re-indented code if it now compiles (and was saved), otherwise None.
+    Handles IndentationError caused by the whole block being indented (e.g. copied from a
+    nested markdown fence) by stripping the common leading whitespace.
+    """
+    if "IndentationError" in output:
+        fixed_code = textwrap.dedent(code)
+        if fixed_code == code:
+            return None
+        try:
+            compile(fixed_code, str(PARSER_PATH), "exec")
+        except SyntaxError:
+            return None
+        print("   Indentation error detected. Re-indenting generated code...")
+        save_parser(fixed_code, PARSER_PATH)
+        return fixed_code
+
+    return None
+
+def read_target_columns(csv_path: str) -> list:
+    """Reads only the header row of the expected CSV to get the exact column names for the target schema."""
+    import pandas as pd
+
     try:
-        df_expected = pd.read_csv(csv_path, encoding="utf-8")
-        columns = df_expected.columns.tolist()
+        df_expected_cols = pd.read_csv(csv_path, encoding="utf-8", nrows=0)
+        return df_expected_cols.columns.tolist()
     except Exception:
-        columns = ['Date', 'Description', 'Withdrawal', 'Deposit', 'Balance'] # Fallback
+        return ['Date', 'Description', 'Withdrawal', 'Deposit', 'Balance'] # Fallback
 
+def generate_prompt(target: str, pdf_text: str, columns: list, is_initial: bool, previous_code: str, error_trace: str) -> tuple[str, str]:
+    """
+    Generates the planning/refinement prompt for the LLM as a (static_prefix, dynamic_suffix) pair.
+    The prefix is identical across attempts so it can be served from the provider's prompt cache;
+    the suffix carries the per-attempt task, previous code and error trace.
+    """
     base_prompt = f"""
 You are an expert "Agent-as-Coder" AI. Your goal is to write a Python parser for the bank statement PDF.
 
@@ -140,10 +313,10 @@ CONSTRAINTS:
 3.  **Data Transformation:** Map the input columns ('Debit Amt' and 'Credit Amt') to the target schema ('Withdrawal' and 'Deposit'). Missing values must be NaN. Dates must be standardized to YYYY-MM-DD format.
 """
     if is_initial:
-        return base_prompt + "\n**TASK:** Write the complete initial Python code for the function. Output ONLY the Python code block (using ```python ... ```)."
+        return base_prompt, "\n**TASK:** Write the complete initial Python code for the function. Output ONLY the Python code block (using ```python ... ```)."
     else:
         # Refinement Prompt (T1: Self-Fix)
-        return f"""{base_prompt}
+        return base_prompt, f"""
 
 Your previous code attempt failed the automated tests. Analyze the **ERROR TRACE** and **PREVIOUS CODE** to identify and fix the bug.
 
@@ -182,6 +355,9 @@ def run_agent(target: str):
         print(f"Critical Error: Failed to extract text from PDF: {e}")
         sys.exit(1)
     
+    # 2. Target schema columns do not change between attempts, so read them once
+    columns = read_target_columns(str(CSV_PATH))
+    
     # State Initialization
     attempts = 0
     previous_code = ""
@@ -193,11 +369,11 @@ def run_agent(target: str):
 
         # A. Plan / Generate Code
         is_initial = (attempts == 0)
-        # Pass the PDF text and path strings to the prompt function
-        prompt = generate_prompt(target, pdf_text, str(CSV_PATH), is_initial, previous_code, error_trace)
+        # Pass the PDF text and target columns to the prompt function
+        static_prefix, dynamic_suffix = generate_prompt(target, pdf_text, columns, is_initial, previous_code, error_trace)
         print(f"   ({ 'Planning & Initial Code Generation' if is_initial else 'Self-Fix & Code Refinement' }...)")
 
-        llm_output = get_llm_response(prompt)
+        llm_output = get_llm_response(static_prefix, dynamic_suffix, use_context_cache=not is_initial)
         
         if "LLM_API_ERROR" in llm_output:
             print(f"   LLM failed to respond: {llm_output}. Aborting.")
@@ -217,6 +393,14 @@ def run_agent(target: str):
         print("   (Running Tests...)")
         result, output = run_test_and_capture_output(target)
 
+        # C2. Fast-path recovery: fix cheap, deterministic errors locally and re-test without an LLM call
+        if result == "FAIL":
+            fixed_code = apply_local_fix(output, generated_code)
+            if fixed_code is not None:
+                generated_code = fixed_code
+                print("   (Re-running Tests...)")
+                result, output = run_test_and_capture_output(target)
+
         # D. Observe Results & Decide (Self-Correction)
         if result == "PASS":
             print("\n" + "#" * 60)
@@ -0,0 +1,33 @@
+import asyncio
+import importlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+
+async def parse_many(pdf_paths: list, target: str = "icici", max_workers: int = None) -> list:
+    """
+    Parses several bank statement PDFs concurrently with the generated parser for `target`.
+
+    This lives outside the generated parser file (which the agent overwrites on every run) and
+    loads `custom_parsers.<target>_parser.parse` by name. pdfplumber's layout analysis is pure
+    Python and holds the GIL, so files are parsed in separate worker processes; "spawn" is used
+    so workers never fork from a process that may already be running threads.
+
+    Args:
+        pdf_paths (list): Paths to the PDF bank statement files.
+        target (str): Bank target whose parser to use (e.g. 'icici').
+        max_workers (int): Maximum number of worker processes. Defaults to the CPU count.
+
+    Returns:
+        list: One DataFrame per input path, in the same order as `pdf_paths`.
+    """
+    if not pdf_paths:
+        return []
+
+    parse = importlib.import_module(f"custom_parsers.{target}_parser").parse
+    workers = min(len(pdf_paths), max_workers or os.cpu_count() or 1)
+
+    loop = asyncio.get_running_loop()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as ex:
+        return await asyncio.gather(*(loop.run_in_executor(ex, parse, str(pdf_path)) for pdf_path in pdf_paths))
@@ -2,9 +2,19 @@ import pandas as pd
 import pdfplumber
 import re
 
-import pdfplumber
-import pandas as pd
-import re
+import numpy as np
+
+# Column names as they appear in the PDF for initial extraction
+_PDF_COLS = ('Date', 'Description', 'Debit Amt', 'Credit Amt', 'Balance')
+# Target schema columns for the final DataFrame
+_TARGET = ('Date', 'Description', 'Withdrawal', 'Deposit', 'Balance')
+
+def _is_txn_date(value: str) -> bool:
+    """Returns True if the cell has the DD-MM-YYYY shape of a transaction date."""
+    return (
+        len(value) == 10 and value[2] == '-' and value[5] == '-'
+        and value[:2].isdigit() and value[3:5].isdigit() and value[6:].isdigit()
+    )
 
 def parse(pdf_path: str) -> pd.DataFrame:
     """
@@ -18,71 +28,54 @@ def parse(pdf_path: str) -> pd.DataFrame:
                       ['Date', 'Description', 'Withdrawal', 'Deposit', 'Balance'].
                       Dates are in YYYY-MM-DD format, and numeric columns have NaN for missing values.
     """
-    all_transactions_data = []
-    # Define the column names as they appear in the PDF for initial extraction
-    pdf_header_columns = ['Date', 'Description', 'Debit Amt', 'Credit Amt', 'Balance']
-    # Define the target schema columns for the final DataFrame
-    target_schema_columns = ['Date', 'Description', 'Withdrawal', 'Deposit', 'Balance']
-
+    tables = []
     with pdfplumber.open(pdf_path) as pdf:
         for page in pdf.pages:
             # Extract tables from the page using default settings.
-            tables = page.extract_tables()
-
-            for table in tables:
-                for row in table:
-                    # Clean each cell: strip leading/trailing whitespace, replace None with empty string
-                    cleaned_row = [cell.strip() if cell is not None else '' for cell in row]
+            tables.extend(page.extract_tables())
 
-                    # Filter out completely empty rows
-                    if not any(cell for cell in cleaned_row):
-                        continue
+    # Flatten all tables into one list, keeping only rows with the expected 5-column structure.
+    rows = [row for table in tables for row in table if row and len(row) == 5]
 
-                    # Normalize row for header comparison: replace multiple spaces with single space and strip
-                    normalized_row_for_header_check = [re.sub(r'\s+', ' ', cell).strip() for cell in cleaned_row]
+    # If no candidate rows were found, return an empty DataFrame with the target schema columns
+    if not rows:
+        return pd.DataFrame(columns=list(_TARGET))
 
-                    # Check if the current row is the header row (using the PDF's actual header names)
-                    if normalized_row_for_header_check == pdf_header_columns:
-                        continue  # Skip header rows
+    # Clean every cell in bulk: replace None with empty string, then strip leading/trailing whitespace
+    arr = np.array(rows, dtype=object)
+    arr[arr == None] = ''  # Element-wise comparison (`is None` does not broadcast)
+    arr = np.char.strip(arr.astype(str))
 
-                    # Process as a transaction data row
-                    # A valid transaction row is expected to have 5 columns and start with a date in DD-MM-YYYY format.
-                    if len(cleaned_row) == 5 and re.match(r'^\d{2}-\d{2}-\d{4}$', cleaned_row[0]):
-                        all_transactions_data.append(cleaned_row)
-                    else:
-                        # If a row does not match the expected 5-column structure or date format,
-                        # it's likely a footer, a partial row, or some other non-transaction text.
-                        # These rows are skipped to ensure data quality.
-                        pass
+    # Create a DataFrame from the cleaned cells using the PDF's column names
+    df = pd.DataFrame(arr, columns=list(_PDF_COLS))
 
-    # If no transactions were found, return an empty DataFrame with the target schema columns
-    if not all_transactions_data:
-        return pd.DataFrame(columns=target_schema_columns)
-
-    # Create a DataFrame from the collected transaction data using the PDF's column names
-    df = pd.DataFrame(all_transactions_data, columns=pdf_header_columns)
+    # A valid transaction row starts with a date in DD-MM-YYYY format.
+    # Header rows, footers, partial rows and empty rows fail this check and are dropped in one pass.
+    df = df[df['Date'].map(_is_txn_date)].reset_index(drop=True)
 
     # --- Data Cleaning and Transformation ---
 
     # 1. Date conversion: Convert 'DD-MM-YYYY' to 'YYYY-MM-DD'
     # 'errors='coerce'' will turn unparseable dates into NaT (Not a Time)
-    df['Date'] = pd.to_datetime(df['Date'], format='%d-%m-%Y', errors='coerce').dt.strftime('%Y-%m-%d')
-
-    # 2. Numeric conversion for 'Debit Amt', 'Credit Amt', 'Balance'
-    # Replace empty strings with pandas' NA (Not Available) for better numeric type handling.
-    # 'errors='coerce'' will turn non-numeric values into NaN.
-    for col in ['Debit Amt', 'Credit Amt', 'Balance']:
-        df[col] = df[col].replace('', pd.NA)
-        df[col] = pd.to_numeric(df[col], errors='coerce')
+    # 'cache=True' parses each distinct date once, since statements repeat dates across transactions.
+    dates = pd.to_datetime(df['Date'], format='%d-%m-%Y', errors='coerce', cache=True)
 
-    # Filter out any rows where the Date could not be parsed, as these are likely malformed
-    # or non-transactional rows that slipped through previous filters.
-    df.dropna(subset=['Date'], inplace=True)
+    # Rows where the Date could not be parsed are likely malformed or non-transactional rows
+    # that slipped through previous filters; they are left out of the final DataFrame.
+    mask = dates.notna().to_numpy()
 
-    # 3. Rename columns to match the target schema: 'Debit Amt' -> 'Withdrawal', 'Credit Amt' -> 'Deposit'
-    df.rename(columns={'Debit Amt': 'Withdrawal', 'Credit Amt': 'Deposit'}, inplace=True)
-
-    # 4. Ensure the final DataFrame has the correct column order as per the target schema
-    df = df[target_schema_columns]
-
-    return df
\ No newline at end of file
+    # 2. Numeric conversion for 'Debit Amt', 'Credit Amt', 'Balance'
+    # All three columns are converted together; 'errors='coerce'' turns empty strings and
+    # other non-numeric values into NaN.
+    num_cols = ['Debit Amt', 'Credit Amt', 'Balance']
+    amounts = df[num_cols].apply(pd.to_numeric, errors='coerce')
+
+    # 3. Build the final DataFrame directly in the target schema's names and column order:
+    # 'Debit Amt' -> 'Withdrawal', 'Credit Amt' -> 'Deposit'
+    return pd.DataFrame({
+        'Date': dates[mask].dt.strftime('%Y-%m-%d').to_numpy(),
+        'Description': df['Description'].to_numpy()[mask],
+        'Withdrawal': amounts['Debit Amt'].to_numpy()[mask],
+        'Deposit': amounts['Credit Amt'].to_numpy()[mask],
+        'Balance': amounts['Balance'].to_numpy()[mask],
+    }, columns=list(_TARGET))
\ No newline at end of file
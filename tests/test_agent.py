@@ -0,0 +1,45 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import agent
+
+INDENTED_RESPONSE = """Here is the parser:
+```python
+    import pandas as pd
+
+    def parse(pdf_path: str) -> pd.DataFrame:
+        return pd.DataFrame()
+```
+"""
+
+
+def test_indented_block_is_recovered_locally(tmp_path, monkeypatch):
+    parser_path = tmp_path / "icici_parser.py"
+    monkeypatch.setattr(agent, "PARSER_PATH", parser_path)
+
+    code = agent.extract_python_code(INDENTED_RESPONSE)
+    try:
+        compile(code, "generated", "exec")
+    except IndentationError as e:
+        output = f"IndentationError: {e}"
+    else:
+        raise AssertionError("extracted block should keep its indentation")
+
+    fixed_code = agent.apply_local_fix(output, code)
+
+    assert fixed_code is not None
+    assert fixed_code.startswith("import pandas as pd\n\ndef parse(")
+    compile(parser_path.read_text(encoding="utf-8"), str(parser_path), "exec")
+
+
+def test_unfixable_indentation_is_left_to_the_llm(tmp_path, monkeypatch):
+    parser_path = tmp_path / "icici_parser.py"
+    monkeypatch.setattr(agent, "PARSER_PATH", parser_path)
+
+    code = "def parse(pdf_path):\nreturn None\n"
+
+    assert agent.apply_local_fix("IndentationError: expected an indented block", code) is None
+    assert not parser_path.exists()
@@ -0,0 +1,26 @@
+import asyncio
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from custom_parsers.batch import parse_many
+from custom_parsers.icici_parser import parse
+
+PDF_PATH = ROOT / "data/icici/icici_sample.pdf"
+
+
+def test_parse_many_matches_parse_in_input_order():
+    expected = parse(str(PDF_PATH))
+    results = asyncio.run(parse_many([PDF_PATH, str(PDF_PATH)], target="icici", max_workers=2))
+
+    assert len(results) == 2
+    for df in results:
+        pd.testing.assert_frame_equal(df, expected)
+
+
+def test_parse_many_empty():
+    assert asyncio.run(parse_many([])) == []
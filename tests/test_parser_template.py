@@ -4,6 +4,10 @@ import importlib.util
 import traceback
 from pathlib import Path
 
+def _norm_str(s):
+    """Normalizes a text column: NaN to '', collapsed whitespace, stripped, as the `string` dtype."""
+    return s.fillna('').astype('string').str.replace(r'\s+', ' ', regex=True).str.strip()
+
 def run_test(bank_target):
     """
     Attempts to run the generated parser and compares the DataFrame output
@@ -36,7 +40,8 @@ def run_test(bank_target):
         df_actual = parse_func(str(pdf_path))
         
         # 3. Load Expected CSV
-        df_expected = pd.read_csv(csv_path)
+        # Read every column as text to skip dtype inference; dates and numbers are converted explicitly below
+        df_expected = pd.read_csv(csv_path, dtype=str)
         
         # Define the target schema columns (T3)
         target_schema_columns = ['Date', 'Description', 'Withdrawal', 'Deposit', 'Balance']
@@ -55,27 +60,32 @@ def run_test(bank_target):
         for col in ['Date']:
              if col in df_expected.columns:
                  # Standardize expected date format (DD-MM-YYYY) and ensure datetime dtype
-                 df_expected[col] = pd.to_datetime(df_expected[col], format='%d-%m-%Y', errors='coerce')
+                 df_expected[col] = pd.to_datetime(df_expected[col], format='%d-%m-%Y', errors='coerce', cache=True)
                  df_actual[col] = pd.to_datetime(df_actual[col], errors='coerce', infer_datetime_format=True) # Actual is parsed by LLM code
         
         # Numeric Standardization (handling float, commas, and the 0.0 vs NaN rule)
+        # Cleaned columns are collected first and assigned to each frame in a single step.
         float_cols = ['Withdrawal', 'Deposit', 'Balance']
+        expected_numeric = {}
+        actual_numeric = {}
         for col in float_cols:
             if col in df_expected.columns:
-                # Clean expected CSV numbers
-                df_expected[col] = pd.to_numeric(df_expected[col].astype(str).str.replace(',', '', regex=False), errors='coerce')
+                # Clean expected CSV numbers (text column, so no astype(str) round-trip is needed)
+                values = pd.to_numeric(df_expected[col].str.replace(',', '', regex=False), errors='coerce')
                 
-                # CRITICAL: If the value is 0.0, replace it with pd.NA to match the CSV's empty cell (NaN) interpretation.
+                # CRITICAL: If the value is 0.0, replace it with NaN to match the CSV's empty cell (NaN) interpretation.
                 if col in ['Withdrawal', 'Deposit']:
-                    df_expected[col] = df_expected[col].replace(0.00, pd.NA).astype(float)
+                    values = values.mask(values == 0.0)
                     # Also ensure the actual column aligns its type
-                    df_actual[col] = df_actual[col].replace(0.00, pd.NA).astype(float) 
+                    actual_numeric[col] = df_actual[col].replace(0.00, pd.NA).astype(float)
+                expected_numeric[col] = values
+        df_expected = df_expected.assign(**expected_numeric)
+        df_actual = df_actual.assign(**actual_numeric)
 
         # String Standardization (removing excessive whitespace and ensuring fillna)
-        for col in ['Description']:
-             if col in df_expected.columns:
-                 df_expected[col] = df_expected[col].fillna('').astype(str).str.replace(r'\s+', ' ', regex=True).str.strip()
-                 df_actual[col] = df_actual[col].fillna('').astype(str).str.replace(r'\s+', ' ', regex=True).str.strip()
+        str_cols = [col for col in ['Description'] if col in df_expected.columns]
+        df_expected[str_cols] = df_expected[str_cols].apply(_norm_str)
+        df_actual[str_cols] = df_actual[str_cols].apply(_norm_str)
 
 
         # 4. Full Data Comparison (T4)